@@ -1,23 +1,152 @@
 # app.py
+import asyncio
+import gzip
+import hashlib
+import inspect
 import os
+import random
+import re
+import threading
 import uuid
-from fastapi import FastAPI, HTTPException, Query, UploadFile, File
-from fastapi.responses import FileResponse, HTMLResponse
+from contextlib import asynccontextmanager
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from fastapi import FastAPI, HTTPException, Query, UploadFile, File, Header, Request
+from fastapi.responses import FileResponse, HTMLResponse, Response
 from fastapi.staticfiles import StaticFiles
 
-from config import DOWNLOAD_DIR, DEFAULT_COLOR1, DEFAULT_COLOR2, DEFAULT_PLATFORM
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from config import (DOWNLOAD_DIR, DEFAULT_COLOR1, DEFAULT_COLOR2, DEFAULT_PLATFORM, STREAM_SOURCES,
+                    PROFILE_SAMPLE_RATE, ADMIN_TOKEN, WARMUP, RENDER_MODE, FARM_POLL_INTERVAL, FARM_JOB_TIMEOUT)
 from utils import time_to_seconds
-from services import format_text_with_groq, get_video_info, create_template_video
-from services.video import download_video as dl_video, extract_preview_frame
+from services import format_text_with_groq, get_video_info, create_template_video, warm_up
+from services.video import download_video as dl_video, extract_preview_frame, resolve_source, open_source_stream
+from services.cache import render_fingerprint, bind_idempotency_key, run_once
+from services.process import current_job, get_metrics, ProcessTimeout
+from services import profiling
+from services.broker import get_broker, DONE, FINISHED
+from services.artifacts import get_artifact_store
+
+STATIC_DIR = Path(__file__).parent / "static"
+INDEX_PATH = STATIC_DIR / "index.html"
+
+# Artifacts named by a fresh uuid are never rewritten, so browsers may cache them forever
+IMMUTABLE_FILE = re.compile(
+    r"^(bg_)?[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}(_preview)?\.[A-Za-z0-9]+$"
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background warm-up; uvicorn begins accepting requests once this yields"""
+    warmup_task = None
+    if WARMUP:
+        warmup_task = asyncio.create_task(asyncio.to_thread(warm_up))
+    yield
+    if warmup_task:
+        warmup_task.cancel()
+
+
+app = FastAPI(lifespan=lifespan)
+app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
+
+# Renders abandoned because the requesting client went away
+DISCONNECT_ABORTS = 0
+
+# In farm mode renders run on worker.py processes; inputs and outputs move through the store
+broker = get_broker() if RENDER_MODE == "farm" else None
+store = get_artifact_store() if RENDER_MODE == "farm" else None
+
+# Frontend bytes and precompressed variants, rebuilt only when index.html changes
+_frontend = {"mtime": None}
+
 
-app = FastAPI()
+def load_frontend() -> dict:
+    """Return the cached frontend, reloading it if the file on disk changed"""
+    mtime = INDEX_PATH.stat().st_mtime
+    if _frontend["mtime"] != mtime:
+        body = INDEX_PATH.read_bytes()
+        variants = {"identity": body, "gzip": gzip.compress(body, compresslevel=9)}
+        if brotli:
+            variants["br"] = brotli.compress(body)
+        digest = hashlib.sha256(body).hexdigest()[:16]
+        _frontend.update(
+            mtime=mtime,
+            variants=variants,
+            # Each encoding is a different representation and needs its own strong ETag
+            etags={enc: f'"{digest}"' if enc == "identity" else f'"{digest}-{enc}"' for enc in variants},
+            last_modified=formatdate(mtime, usegmt=True),
+        )
+    return _frontend
+
+
+def pick_encoding(accept_encoding: str, available) -> str:
+    """Choose the precompressed variant the client prefers by q-value (q=0 means refused)"""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, *params = [p.strip() for p in part.split(";")]
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name:
+            accepted[name] = q
+    best, best_q = "identity", 0.0
+    # br before gzip so it wins ties
+    for encoding in ("br", "gzip"):
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        if encoding in available and q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True if the client's If-None-Match already names this ETag"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+
+def not_modified_since(request: Request, mtime: float) -> bool:
+    """True if If-Modified-Since is at or after mtime; only consulted without If-None-Match"""
+    header = request.headers.get("if-modified-since")
+    if not header or request.headers.get("if-none-match"):
+        return False
+    try:
+        since = parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError):
+        return False
+    # Last-Modified has whole-second resolution
+    return int(mtime) <= since
 
 
 @app.get("/", response_class=HTMLResponse)
-def index():
+def index(request: Request):
     """Serve the frontend HTML"""
-    with open("static/index.html", "r", encoding="utf-8") as f:
-        return f.read()
+    frontend = load_frontend()
+    encoding = pick_encoding(request.headers.get("accept-encoding", ""), frontend["variants"])
+    headers = {
+        "ETag": frontend["etags"][encoding],
+        "Last-Modified": frontend["last_modified"],
+        "Cache-Control": "no-cache",
+        "Vary": "Accept-Encoding",
+    }
+    if etag_matches(request, headers["ETag"]) or not_modified_since(request, frontend["mtime"]):
+        return Response(status_code=304, headers=headers)
+
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return HTMLResponse(frontend["variants"][encoding], headers=headers)
 
 
 @app.post("/upload-bg")
@@ -30,6 +159,8 @@ async def upload_background(file: UploadFile = File(...)):
     with open(filepath, "wb") as f:
         content = await file.read()
         f.write(content)
+    if store:
+        await asyncio.to_thread(store.put, filepath)
     
     return {"id": f"bg_{file_id}.{ext}"}
 
@@ -72,6 +203,12 @@ def prepare_video(
         
         # Extract preview frame and get dimensions
         width, height = extract_preview_frame(actual_file, preview_file)
+
+        # Any worker may render this video, so the source lives in the shared store
+        if store:
+            store.put(actual_file)
+            store.put(preview_file)
+            os.remove(actual_file)
         
         return {
             "video_id": file_id,
@@ -85,11 +222,26 @@ def prepare_video(
         for f in [raw_file, preview_file]:
             if os.path.exists(f):
                 os.remove(f)
+        remove_raw_files(file_id)
         raise HTTPException(status_code=400, detail=str(e))
 
 
+def remove_raw_files(file_id: str):
+    """Delete a source download and any .part/format fragments yt-dlp left behind"""
+    for f in os.listdir(DOWNLOAD_DIR):
+        if f.startswith(f"{file_id}_raw"):
+            os.remove(os.path.join(DOWNLOAD_DIR, f))
+
+
+async def wait_for_disconnect(request: Request):
+    """Return once the client has closed the connection"""
+    while not await request.is_disconnected():
+        await asyncio.sleep(1)
+
+
 @app.post("/download")
 async def download_video(
+    request: Request,
     url: str = Query(default=None),
     video_id: str = Query(default=None),
     start_time: str = Query(default="00:00:00"),
@@ -105,9 +257,88 @@ async def download_video(
     crop_x: float = Query(default=0),
     crop_y: float = Query(default=0),
     crop_w: float = Query(default=100),
-    crop_h: float = Query(default=100)
+    crop_h: float = Query(default=100),
+    idempotency_key: str = Header(default=None),
+    x_profile: str = Header(default=None),
+    x_admin_token: str = Header(default=None)
 ):
-    """Generate video with template. Use video_id if already prepared, or url to download fresh."""
+    """Generate video with template. Use video_id if already prepared, or url to download fresh.
+
+    Identical submissions share one render: a finished result is returned from
+    the cache and a retry while the first render is running waits for it.
+    With ADMIN_TOKEN set, `X-Profile: 1` plus a matching `X-Admin-Token` profiles
+    a fresh render that bypasses the cache, and PROFILE_SAMPLE_RATE profiles a
+    share of uncached renders. Without ADMIN_TOKEN profiling is off entirely.
+    """
+    if not video_id and not url:
+        raise HTTPException(status_code=400, detail="Either url or video_id required")
+
+    start_sec = time_to_seconds(start_time)
+    end_sec = time_to_seconds(end_time)
+
+    # Crop params as percentages
+    crop_params = {"x": crop_x, "y": crop_y, "w": crop_w, "h": crop_h}
+
+    fingerprint = render_fingerprint({
+        "source": {"video_id": video_id} if video_id else {"url": url, "start": start_sec, "end": end_sec},
+        "overlay_text": overlay_text,
+        "username": username,
+        "platform": platform,
+        "color1": color1,
+        "color2": color2,
+        "bg_image_id": bg_image_id if bg_type == "image" else None,
+        "gradient_angle": gradient_angle,
+        "crop": crop_params,
+    })
+    if idempotency_key:
+        try:
+            bind_idempotency_key(idempotency_key, fingerprint)
+        except ValueError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+
+    render = submit_render if broker else render_video
+    args = (url, video_id, start_sec, end_sec, overlay_text, username, platform,
+            color1, color2, bg_type, bg_image_id, gradient_angle, crop_params)
+    # Profiled renders cost a full uncached render plus a sampler, so only admins may ask;
+    # the header is ignored otherwise, and with no ADMIN_TOKEN nobody could fetch the result
+    if ADMIN_TOKEN and x_profile == "1" and x_admin_token == ADMIN_TOKEN:
+        # A cached or shared render has nothing to profile, so this one runs on its own
+        work = asyncio.ensure_future(render(*args, True))
+    else:
+        profiled = bool(ADMIN_TOKEN) and random.random() < PROFILE_SAMPLE_RATE
+        work = asyncio.ensure_future(run_once(fingerprint, lambda: render(*args, profiled)))
+    disconnect = asyncio.ensure_future(wait_for_disconnect(request))
+    await asyncio.wait({work, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+
+    if work.done():
+        disconnect.cancel()
+        return work.result()
+
+    # Client is gone - stop waiting; the render is killed if nobody rejoins it in time
+    global DISCONNECT_ABORTS
+    DISCONNECT_ABORTS += 1
+    print(f"[DOWNLOAD] Client disconnected, aborting {fingerprint[:12]}")
+    work.cancel()
+    raise HTTPException(status_code=499, detail="Client disconnected")
+
+
+async def render_video(
+    url: str,
+    video_id: str,
+    start_sec: int,
+    end_sec: int,
+    overlay_text: str,
+    username: str,
+    platform: str,
+    color1: str,
+    color2: str,
+    bg_type: str,
+    bg_image_id: str,
+    gradient_angle: str,
+    crop_params: dict,
+    profiled: bool = False
+) -> dict:
+    """Download (if needed), format text and composite the final reel"""
     
     # Determine file_id and raw_file
     if video_id:
@@ -120,23 +351,48 @@ async def download_video(
                 break
         if not raw_file:
             raise HTTPException(status_code=400, detail="Prepared video not found")
-    elif url:
+    else:
         file_id = str(uuid.uuid4())
         raw_file = os.path.join(DOWNLOAD_DIR, f"{file_id}_raw.mp4")
-    else:
-        raise HTTPException(status_code=400, detail="Either url or video_id required")
-    
-    final_file = os.path.join(DOWNLOAD_DIR, f"{file_id}.mp4")
-    start_sec = time_to_seconds(start_time)
-    end_sec = time_to_seconds(end_time)
     
-    # Crop params as percentages
-    crop_params = {"x": crop_x, "y": crop_y, "w": crop_w, "h": crop_h}
+    # Every render writes its own output: renders of one prepared video with
+    # different text run concurrently and must not share a path
+    output_id = str(uuid.uuid4()) if video_id else file_id
+    final_file = os.path.join(DOWNLOAD_DIR, f"{output_id}.mp4")
+
+    # Set when this render is cancelled; subprocesses and yt-dlp started from
+    # worker threads of this task watch it via the copied context
+    job = threading.Event()
+    current_job.set(job)
+
+    profile = None
+    if profiled:
+        profile = profiling.Profile(output_id)
+        profile.start()
+        profiling.current_profile.set(profile)
+    result = {"file": f"{output_id}.mp4", "profile": output_id} if profile else {"file": f"{output_id}.mp4"}
 
+    source = None
     try:
+        # Format text with Groq
+        groq_result = await format_text_with_groq(overlay_text)
+        generated_title = groq_result.get("title", "")
+        formatted_body = groq_result.get("body", overlay_text)
+        needs_template = bool(formatted_body or username)
+
+        # Fresh URLs are piped straight into the compositor when the source allows it;
+        # clips with a start offset keep yt-dlp's ranged download to a file
+        # One extraction serves both the stream and, when it falls back, the download
+        resolved = None
+        if not video_id and needs_template and STREAM_SOURCES and not start_sec:
+            resolved = await asyncio.to_thread(profiling.call, resolve_source, url)
+            source = await asyncio.to_thread(profiling.call, open_source_stream, resolved, end_sec)
+
         # Download if not using prepared video
-        if not video_id:
-            info = dl_video(url, raw_file, start_sec, end_sec)
+        if source:
+            title = source["title"]
+        elif not video_id:
+            info = await asyncio.to_thread(profiling.call, dl_video, url, raw_file, start_sec, end_sec, resolved)
             title = info.get("title", "video")
             raw_file = raw_file.replace('.mp4', f'.{info.get("ext", "mp4")}')
             if not os.path.exists(raw_file):
@@ -147,21 +403,17 @@ async def download_video(
         else:
             title = "video"
         
-        # Format text with Groq
-        groq_result = await format_text_with_groq(overlay_text)
-        generated_title = groq_result.get("title", "")
-        formatted_body = groq_result.get("body", overlay_text)
-        
         # Background image
         bg_image_path = None
         if bg_type == "image" and bg_image_id:
             bg_image_path = os.path.join(DOWNLOAD_DIR, bg_image_id)
         
         # Apply template with crop
-        if formatted_body or username:
-            create_template_video(
+        if needs_template:
+            await asyncio.to_thread(
+                profiling.call, create_template_video,
                 raw_file, final_file, generated_title, formatted_body, username, platform,
-                color1, color2, bg_image_path, gradient_angle, crop_params
+                color1, color2, bg_image_path, gradient_angle, crop_params, source
             )
             # Cleanup raw and preview
             if os.path.exists(raw_file):
@@ -169,24 +421,125 @@ async def download_video(
             preview_file = os.path.join(DOWNLOAD_DIR, f"{file_id}_preview.jpg")
             if os.path.exists(preview_file):
                 os.remove(preview_file)
-            return {"file": f"{file_id}.mp4", "title": title}
+            return {**result, "title": title}
         else:
             os.rename(raw_file, final_file)
-            return {"file": f"{file_id}.mp4", "title": title}
+            return {**result, "title": title}
             
+    except asyncio.CancelledError:
+        # The worker thread keeps running until its subprocess notices the event
+        job.set()
+        if os.path.exists(final_file):
+            os.remove(final_file)
+        # Keep a prepared source so the user can render it again
+        if not video_id:
+            remove_raw_files(file_id)
+        raise
+    except ProcessTimeout as e:
+        for f in [raw_file, final_file]:
+            if f and os.path.exists(f):
+                os.remove(f)
+        if not video_id:
+            remove_raw_files(file_id)
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         for f in [raw_file, final_file]:
             if f and os.path.exists(f):
                 os.remove(f)
+        if not video_id:
+            remove_raw_files(file_id)
         raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        # The source connection stays open if the encode never started
+        if source:
+            source["close"]()
+        if profile:
+            # Writing the profile files is blocking I/O; shielded so a cancelled render still saves
+            await asyncio.shield(asyncio.to_thread(profile.save))
+
+
+async def submit_render(*args) -> dict:
+    """Farm mode: queue the render_video arguments for a worker and wait for its result"""
+    payload = dict(inspect.signature(render_video).bind(*args).arguments)
+    job_id = await asyncio.to_thread(broker.submit, payload)
+    print(f"[FARM] Submitted job {job_id}")
+    deadline = asyncio.get_running_loop().time() + FARM_JOB_TIMEOUT
+    try:
+        while True:
+            await asyncio.sleep(FARM_POLL_INTERVAL)
+            job = await asyncio.to_thread(broker.get, job_id)
+            if job["status"] in FINISHED:
+                break
+            if asyncio.get_running_loop().time() >= deadline:
+                await asyncio.to_thread(broker.cancel, job_id)
+                raise HTTPException(status_code=504, detail=f"Render timed out after {FARM_JOB_TIMEOUT:.0f}s")
+    except asyncio.CancelledError:
+        # Shielded so the cancel is written even though this task is being cancelled
+        await asyncio.shield(asyncio.to_thread(broker.cancel, job_id))
+        raise
+
+    if job["status"] != DONE:
+        raise HTTPException(status_code=400, detail=job["error"] or f"Render {job['status']}")
+    result = job["result"]
+    # Keep a local copy so /file and the result cache work without another store round trip
+    await asyncio.to_thread(store.get, result["file"], os.path.join(DOWNLOAD_DIR, result["file"]))
+    return result
+
+
+@app.get("/metrics")
+def metrics():
+    """Subprocess and render counters"""
+    return {"subprocesses": get_metrics(), "disconnect_aborts": DISCONNECT_ABORTS}
 
 
 @app.get("/file/{name}")
-def get_file(name: str):
+def get_file(name: str, request: Request):
     """Serve a downloaded file"""
     if ".." in name or "/" in name:
         raise HTTPException(status_code=400, detail="Invalid filename")
+    # Profiles are only served through the admin endpoint
+    if name.endswith(tuple(profiling.PROFILE_FILES.values())):
+        raise HTTPException(status_code=404, detail="File not found")
     path = os.path.join(DOWNLOAD_DIR, name)
-    if not os.path.exists(path):
+    if not os.path.exists(path) and not (store and store.get(name, path)):
         raise HTTPException(status_code=404, detail="File not found")
-    return FileResponse(path, filename=name)
+
+    cache_control = "public, max-age=31536000, immutable" if IMMUTABLE_FILE.match(name) else "no-cache"
+    response = FileResponse(path, filename=name, stat_result=os.stat(path),
+                            headers={"Cache-Control": cache_control})
+    if etag_matches(request, response.headers["etag"]):
+        return Response(status_code=304, headers={
+            "ETag": response.headers["etag"],
+            "Last-Modified": response.headers["last-modified"],
+            "Cache-Control": cache_control,
+        })
+    return response
+
+
+@app.get("/admin/profile/{job_id}")
+def get_profile(
+    job_id: str,
+    format: str = Query(default="folded"),
+    x_admin_token: str = Header(default=None)
+):
+    """Download a render profile: folded stacks (flamegraph), pstats, or subprocess benchmark"""
+    if not ADMIN_TOKEN or x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    if ".." in job_id or "/" in job_id:
+        raise HTTPException(status_code=400, detail="Invalid job id")
+    path = profiling.profile_path(job_id, format)
+    if path is None:
+        raise HTTPException(status_code=400, detail=f"Format must be one of {', '.join(profiling.PROFILE_FILES)}")
+    if not os.path.exists(path) and not (store and store.get(os.path.basename(path), path)):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, filename=os.path.basename(path))
+
+
+@app.get("/admin/farm")
+def farm_status(x_admin_token: str = Header(default=None)):
+    """Per-worker throughput and liveness in farm mode"""
+    if not ADMIN_TOKEN or x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    if not broker:
+        raise HTTPException(status_code=404, detail="Render farm not enabled")
+    return {"workers": broker.worker_stats()}
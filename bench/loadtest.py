@@ -0,0 +1,287 @@
+# bench/loadtest.py
+"""Load-test the FastAPI endpoints.
+
+By default the real `app` is driven in-process through httpx's ASGI transport,
+with yt-dlp, the Groq API and (optionally) ffmpeg replaced by local stand-ins so
+results measure this service rather than YouTube or Groq. Pass --target to hit
+a running server (e.g. one started from render.yaml) over HTTP instead. A real
+server fetches real videos, so with --target info/prepare/download need
+--source-url pointing at a video it can fetch and file needs --seed-file naming
+an existing file; endpoints without their input are dropped from the mix.
+Event-loop lag is only measured in-process; it is not reported with --target.
+
+    python bench/loadtest.py --concurrency 16 --duration 30 --mix info=4,prepare=1,download=1,file=4
+    python bench/loadtest.py --target http://localhost:8000 --source-url https://youtu.be/... --mix info=1,download=1
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import subprocess
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+ENDPOINTS = ("info", "prepare", "download", "file")
+
+
+def parse_mix(spec: str) -> dict:
+    """'info=4,download=1' -> {'info': 4, 'download': 1}"""
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise SystemExit(f"Unknown endpoint in mix: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+# === STAND-INS ===
+
+def make_synthetic_clip(path: str, seconds: float):
+    """Render a small test pattern with audio, or write placeholder bytes without ffmpeg"""
+    if shutil.which("ffmpeg"):
+        subprocess.run([
+            'ffmpeg', '-y', '-v', 'error',
+            '-f', 'lavfi', '-i', f'testsrc=size=640x360:rate=30:duration={seconds}',
+            '-f', 'lavfi', '-i', f'sine=frequency=440:duration={seconds}',
+            '-c:v', 'libx264', '-preset', 'ultrafast', '-c:a', 'aac', '-shortest', path
+        ], check=True)
+    else:
+        with open(path, "wb") as f:
+            f.write(os.urandom(256 * 1024))
+
+
+def install_stand_ins(app_module, args, clip_path: str):
+    """Patch yt-dlp, Groq and optionally ffmpeg inside the imported app"""
+    import yt_dlp
+
+    class FakeYoutubeDL:
+        def __init__(self, opts):
+            self.opts = opts
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def extract_info(self, url, download=False):
+            time.sleep(args.extract_latency)
+            return synthetic_info(url)
+
+    def synthetic_info(url: str) -> dict:
+        return {
+            "title": f"Synthetic {url[-8:]}",
+            "duration": int(args.clip_seconds),
+            "thumbnail": None,
+            "channel": "loadtest",
+            "uploader": "loadtest",
+            "ext": "mp4",
+            "width": 640,
+            "height": 360,
+            # Not http(s), so /download takes the file path instead of streaming
+            "protocol": "file",
+        }
+
+    def fake_resolve(url):
+        time.sleep(args.extract_latency)
+        return synthetic_info(url)
+
+    def fake_download(url, output_path, start_sec=None, end_sec=None, info=None):
+        time.sleep(args.extract_latency)
+        shutil.copyfile(clip_path, output_path)
+        return synthetic_info(url)
+
+    yt_dlp.YoutubeDL = FakeYoutubeDL
+    # Resolving and downloading run yt-dlp in a child process, out of reach of the patch above
+    app_module.resolve_source = fake_resolve
+    app_module.dl_video = fake_download
+
+    async def fake_groq(text: str) -> dict:
+        await asyncio.sleep(args.groq_latency)
+        words = text.split()
+        if words:
+            words[0] = f"**{words[0]}**"
+        return {"title": "Load Test Title", "body": " ".join(words)}
+
+    app_module.format_text_with_groq = fake_groq
+
+    if args.fake_ffmpeg:
+        def fake_preview(video_path, output_path):
+            time.sleep(args.preview_latency)
+            Path(output_path).write_bytes(b"\xff\xd8\xff\xd9")
+            return 640, 360
+
+        def fake_template(input_path, output_path, *rest, **kwargs):
+            time.sleep(args.encode_latency)
+            shutil.copyfile(clip_path, output_path)
+            return output_path
+
+        app_module.extract_preview_frame = fake_preview
+        app_module.create_template_video = fake_template
+
+
+# === DRIVER ===
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {name: [] for name in ENDPOINTS}
+        self.errors = {name: 0 for name in ENDPOINTS}
+        self.outputs = []
+        self.prepared = []
+
+    def add(self, name: str, seconds: float, ok: bool):
+        self.latencies[name].append(seconds)
+        if not ok:
+            self.errors[name] += 1
+
+
+async def issue(client: httpx.AsyncClient, name: str, rec: Recorder, args):
+    url = args.source_url or f"https://example.com/watch?v={uuid.uuid4().hex[:11]}"
+    start = time.perf_counter()
+    ok = False
+    try:
+        if name == "info":
+            r = await client.get("/info", params={"url": url})
+        elif name == "prepare":
+            r = await client.post("/prepare", params={"url": url})
+            if r.status_code == 200:
+                rec.prepared.append(r.json()["video_id"])
+        elif name == "download":
+            params = {"overlay_text": f"Load test reel {uuid.uuid4().hex[:6]}", "username": "loadtest"}
+            if rec.prepared and random.random() < 0.5:
+                params["video_id"] = rec.prepared.pop()
+            else:
+                params["url"] = url
+            r = await client.post("/download", params=params)
+            if r.status_code == 200:
+                rec.outputs.append(r.json()["file"])
+        else:
+            name_to_get = random.choice(rec.outputs) if rec.outputs else args.seed_file
+            r = await client.get(f"/file/{name_to_get}")
+        ok = r.status_code == 200
+    except httpx.HTTPError:
+        pass
+    rec.add(name, time.perf_counter() - start, ok)
+
+
+async def worker(client, rec: Recorder, mix: dict, deadline: float, args):
+    names, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        await issue(client, random.choices(names, weights)[0], rec, args)
+
+
+async def measure_loop_lag(samples: list, stop: asyncio.Event, interval: float = 0.01):
+    """Record how late the event loop wakes a sleeping task"""
+    while not stop.is_set():
+        before = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, time.perf_counter() - before - interval))
+
+
+def report(rec: Recorder, elapsed: float, lag: list):
+    print(f"\n{'endpoint':<10}{'count':>8}{'errors':>8}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    total = 0
+    for name in ENDPOINTS:
+        values = rec.latencies[name]
+        if not values:
+            continue
+        total += len(values)
+        print(f"{name:<10}{len(values):>8}{rec.errors[name]:>8}{len(values) / elapsed:>9.1f}"
+              f"{percentile(values, 50) * 1000:>10.1f}{percentile(values, 95) * 1000:>10.1f}"
+              f"{percentile(values, 99) * 1000:>10.1f}")
+    print(f"\ntotal {total} requests in {elapsed:.1f}s ({total / elapsed:.1f} req/s)")
+    if lag:
+        print(f"event-loop lag: p50 {percentile(lag, 50) * 1000:.1f} ms, "
+              f"p99 {percentile(lag, 99) * 1000:.1f} ms, max {max(lag) * 1000:.1f} ms")
+    else:
+        print("event-loop lag: not measured (in-process runs only)")
+
+
+async def main(args):
+    mix = parse_mix(args.mix)
+    if args.target:
+        # Placeholder inputs would only measure the server's error paths
+        missing = {name: "--source-url" for name in ("info", "prepare", "download") if not args.source_url}
+        if not args.seed_file:
+            missing["file"] = "--seed-file"
+        for name in [name for name in mix if name in missing]:
+            print(f"Dropping {name} from the mix: --target needs {missing[name]} for it")
+            del mix[name]
+        if not mix:
+            raise SystemExit("Nothing to run: pass --source-url and/or --seed-file with --target")
+    rec = Recorder()
+    lag = []
+
+    if args.target:
+        client = httpx.AsyncClient(base_url=args.target, timeout=args.timeout)
+    else:
+        import app as app_module
+        from config import DOWNLOAD_DIR
+
+        args.fake_ffmpeg = args.fake_ffmpeg or not shutil.which("ffmpeg")
+        before = set(os.listdir(DOWNLOAD_DIR))
+        clip_path = os.path.join(DOWNLOAD_DIR, f"loadtest_{uuid.uuid4().hex}.mp4")
+        make_synthetic_clip(clip_path, args.clip_seconds)
+        args.seed_file = os.path.basename(clip_path)
+        install_stand_ins(app_module, args, clip_path)
+
+        transport = httpx.ASGITransport(app=app_module.app)
+        client = httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=args.timeout)
+
+    stop = asyncio.Event()
+    lag_task = None if args.target else asyncio.ensure_future(measure_loop_lag(lag, stop))
+
+    print(f"Running {args.concurrency} workers for {args.duration}s, mix {mix}"
+          + ("" if args.target else f", ffmpeg {'stand-in' if args.fake_ffmpeg else 'real'}"))
+    started = time.perf_counter()
+    async with client:
+        await asyncio.gather(*(
+            worker(client, rec, mix, started + args.duration, args) for _ in range(args.concurrency)
+        ))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    if lag_task:
+        await lag_task
+
+    report(rec, elapsed, lag)
+
+    if not args.target and not args.keep:
+        for name in set(os.listdir(DOWNLOAD_DIR)) - before:
+            os.remove(os.path.join(DOWNLOAD_DIR, name))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", help="Base URL of a running server; default drives the app in-process")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=20, help="Seconds to run")
+    parser.add_argument("--mix", default="info=4,prepare=1,download=1,file=4",
+                        help="Weighted endpoint mix, e.g. info=4,download=1")
+    parser.add_argument("--source-url", help="Real video URL for info/prepare/download when --target is used")
+    parser.add_argument("--timeout", type=float, default=300, help="Per-request timeout")
+    parser.add_argument("--seed-file", default="", help="Existing file name for /file when --target is used")
+    parser.add_argument("--fake-ffmpeg", action="store_true", help="Replace preview and encode with sleeps")
+    parser.add_argument("--clip-seconds", type=float, default=5, help="Length of the synthetic source")
+    parser.add_argument("--extract-latency", type=float, default=0.2, help="Simulated yt-dlp time")
+    parser.add_argument("--groq-latency", type=float, default=0.5, help="Simulated Groq API time")
+    parser.add_argument("--preview-latency", type=float, default=0.1, help="Stand-in preview time")
+    parser.add_argument("--encode-latency", type=float, default=2.0, help="Stand-in encode time")
+    parser.add_argument("--keep", action="store_true", help="Keep files created during the run")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,116 @@
+# bench/startup.py
+"""Measure cold-start cost: `import app` time and first-request latency.
+
+Every sample runs in a fresh interpreter so nothing is cached in-process.
+The server runs are repeated with background warm-up on and off so the
+effect of deferring yt_dlp/Pillow/httpx is visible.
+
+    python bench/startup.py --runs 5
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+IMPORT_SNIPPET = """
+import sys, time
+t = time.perf_counter()
+import app
+elapsed = time.perf_counter() - t
+heavy = [m for m in ('yt_dlp', 'PIL', 'httpx') if m in sys.modules]
+print(f"{elapsed:.6f} {','.join(heavy) or '-'}")
+"""
+
+
+def measure_import() -> tuple:
+    out = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], cwd=ROOT,
+                         capture_output=True, text=True, check=True).stdout.split()
+    return float(out[0]), out[1]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def timed_get(url: str) -> float:
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=120) as r:
+            r.read()
+    except urllib.error.HTTPError:
+        # /info with a bogus URL answers 400, which still exercises yt_dlp
+        pass
+    return time.perf_counter() - start
+
+
+def measure_server(warmup: bool) -> dict:
+    port = free_port()
+    env = dict(os.environ, WARMUP="1" if warmup else "0")
+    spawned = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+                break
+            except OSError:
+                if proc.poll() is not None:
+                    raise SystemExit("uvicorn exited during startup")
+                time.sleep(0.01)
+        listening = time.perf_counter() - spawned
+        first_index = timed_get(f"{base}/")
+        # /info is the first endpoint that needs yt_dlp
+        first_info = timed_get(f"{base}/info?url=not-a-url")
+        second_info = timed_get(f"{base}/info?url=not-a-url")
+    finally:
+        proc.terminate()
+        proc.wait()
+    return {
+        "listening": listening,
+        "first /": first_index,
+        "first /info": first_info,
+        "second /info": second_info,
+    }
+
+
+def summarize(label: str, values: list):
+    print(f"  {label:<14} median {statistics.median(values) * 1000:8.1f} ms   "
+          f"min {min(values) * 1000:8.1f} ms   max {max(values) * 1000:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--skip-server", action="store_true", help="Only measure import time")
+    args = parser.parse_args()
+
+    samples = [measure_import() for _ in range(args.runs)]
+    print("import app")
+    summarize("import", [s[0] for s in samples])
+    print(f"  heavy modules loaded at import: {samples[-1][1]}")
+
+    if args.skip_server:
+        return
+    for warmup in (True, False):
+        runs = [measure_server(warmup) for _ in range(args.runs)]
+        print(f"\nserver, warm-up {'on' if warmup else 'off'}")
+        for key in runs[0]:
+            summarize(key, [r[key] for r in runs])
+
+
+if __name__ == "__main__":
+    main()
@@ -23,3 +23,50 @@ DEFAULT_PLATFORM = "instagram"
 # Template dimensions (9:16 vertical)
 TEMPLATE_WIDTH = 1080
 TEMPLATE_HEIGHT = 1920
+
+# Subprocess limits (seconds). Encodes get BASE + PER_SECOND * clip duration.
+PROBE_TIMEOUT = float(os.getenv("PROBE_TIMEOUT", "30"))
+PREVIEW_TIMEOUT = float(os.getenv("PREVIEW_TIMEOUT", "60"))
+RENDER_TIMEOUT_BASE = float(os.getenv("RENDER_TIMEOUT_BASE", "60"))
+RENDER_TIMEOUT_PER_SECOND = float(os.getenv("RENDER_TIMEOUT_PER_SECOND", "4"))
+# yt-dlp metadata extraction (-J) run before streaming a fresh URL
+EXTRACT_TIMEOUT = float(os.getenv("EXTRACT_TIMEOUT", "60"))
+# yt-dlp downloads: BASE + encode deadline for ranged clips, MAX when the length is unknown
+DOWNLOAD_TIMEOUT_BASE = float(os.getenv("DOWNLOAD_TIMEOUT_BASE", "120"))
+DOWNLOAD_TIMEOUT_MAX = float(os.getenv("DOWNLOAD_TIMEOUT_MAX", "1800"))
+# Finished-render results and Idempotency-Key bindings: lifetime in seconds and entry cap
+CACHE_TTL = float(os.getenv("CACHE_TTL", str(24 * 3600)))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+# Seconds a render keeps running after its last client disconnects, so a retry can rejoin it
+RENDER_ORPHAN_GRACE = float(os.getenv("RENDER_ORPHAN_GRACE", "60"))
+# Niceness added to render encodes so they yield to request handling (0 = off)
+RENDER_NICE = int(os.getenv("RENDER_NICE", "0"))
+
+# Pipe URL sources straight into the compositor instead of saving a raw file first
+STREAM_SOURCES = os.getenv("STREAM_SOURCES", "1") == "1"
+STREAM_CHUNK_SIZE = 256 * 1024
+# Bytes read from an MP4 head while looking for the moov box before giving up on piping
+STREAM_PEEK_LIMIT = 4 * 1024 * 1024
+
+# Profiling: fraction of /download renders profiled without the X-Profile header,
+# and the wall-clock sampling interval in seconds. Profiling is off unless ADMIN_TOKEN is set.
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))
+# Required in the X-Admin-Token header for /admin endpoints and X-Profile; unset disables them
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Preload heavy imports in the background once the server is accepting traffic
+WARMUP = os.getenv("WARMUP", "1") == "1"
+
+# Render farm: "local" renders in the API process, "farm" submits jobs to the broker
+# for worker.py processes on any node. Both URLs must point at storage every node shares.
+RENDER_MODE = os.getenv("RENDER_MODE", "local")
+FARM_BROKER_URL = os.getenv("FARM_BROKER_URL", f"sqlite:///{os.path.abspath(DOWNLOAD_DIR)}/farm/broker.db")
+FARM_ARTIFACT_URL = os.getenv("FARM_ARTIFACT_URL", f"file://{os.path.abspath(DOWNLOAD_DIR)}/farm/artifacts")
+FARM_LEASE_SECONDS = float(os.getenv("FARM_LEASE_SECONDS", "30"))
+FARM_MAX_ATTEMPTS = int(os.getenv("FARM_MAX_ATTEMPTS", "3"))
+FARM_POLL_INTERVAL = float(os.getenv("FARM_POLL_INTERVAL", "0.5"))
+# Seconds a farm render may take, queueing included, before the API cancels it and answers 504
+FARM_JOB_TIMEOUT = float(os.getenv("FARM_JOB_TIMEOUT", "3600"))
+# Workers not seen for this long are reported as dead
+FARM_WORKER_STALE = float(os.getenv("FARM_WORKER_STALE", "60"))
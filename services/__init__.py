@@ -1,5 +1,33 @@
-# services/__init__.py
-from .groq import format_text_with_groq
-from .video import get_video_info, download_video, create_template_video
+import importlib
 
-__all__ = ['format_text_with_groq', 'get_video_info', 'download_video', 'create_template_video']
+# Public names resolve on first access so importing the package does not pull in
+# yt_dlp, Pillow or httpx before the server is up.
+_EXPORTS = {
+    'format_text_with_groq': 'services.groq',
+    'get_video_info': 'services.video',
+    'download_video': 'services.video',
+    'create_template_video': 'services.video',
+}
+
+# Heavy third-party modules preloaded by warm_up()
+HEAVY_MODULES = ['yt_dlp', 'PIL.Image', 'PIL.ImageDraw', 'PIL.ImageFont', 'httpx', 'services.overlay']
+
+__all__ = ['format_text_with_groq', 'get_video_info', 'download_video', 'create_template_video', 'warm_up']
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module 'services' has no attribute '{name}'")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+def warm_up():
+    """Import the heavy dependencies so the first real request does not pay for them"""
+    for module in HEAVY_MODULES:
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            print(f"[WARMUP] Failed to import {module}: {e}")
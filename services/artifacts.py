@@ -0,0 +1,70 @@
+import os
+import shutil
+from abc import ABC, abstractmethod
+
+from config import FARM_ARTIFACT_URL
+
+
+class ArtifactStore(ABC):
+    """Shared storage for render inputs and outputs, addressed by file name"""
+
+    @abstractmethod
+    def put(self, local_path: str, name: str = None):
+        ...
+
+    @abstractmethod
+    def get(self, name: str, local_path: str) -> bool:
+        """Copy an artifact to local_path; False if it does not exist"""
+
+    @abstractmethod
+    def list(self, prefix: str) -> list:
+        ...
+
+    @abstractmethod
+    def delete(self, name: str):
+        ...
+
+
+class FileArtifactStore(ArtifactStore):
+    """Artifacts in a directory every node mounts (local disk for a single host, NFS/SMB for several)"""
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, name: str) -> str:
+        if "/" in name or "\\" in name or ".." in name:
+            raise ValueError(f"Invalid artifact name: {name}")
+        return os.path.join(self.root, name)
+
+    def put(self, local_path: str, name: str = None):
+        # Copy under a temporary name, then rename, so readers never see a partial file
+        target = self._path(name or os.path.basename(local_path))
+        partial = f"{target}.partial"
+        shutil.copyfile(local_path, partial)
+        os.replace(partial, target)
+
+    def get(self, name: str, local_path: str) -> bool:
+        source = self._path(name)
+        if not os.path.exists(source):
+            return False
+        partial = f"{local_path}.partial"
+        shutil.copyfile(source, partial)
+        os.replace(partial, local_path)
+        return True
+
+    def list(self, prefix: str) -> list:
+        return sorted(f for f in os.listdir(self.root) if f.startswith(prefix) and not f.endswith(".partial"))
+
+    def delete(self, name: str):
+        path = self._path(name)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def get_artifact_store(url: str = FARM_ARTIFACT_URL) -> ArtifactStore:
+    """Build the store named by a URL such as file:///mnt/shared/artifacts"""
+    scheme, _, rest = url.partition("://")
+    if scheme == "file":
+        return FileArtifactStore(rest)
+    raise ValueError(f"Unsupported artifact store URL: {url}")
@@ -0,0 +1,227 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+from config import FARM_BROKER_URL, FARM_MAX_ATTEMPTS, FARM_WORKER_STALE
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class Broker(ABC):
+    """Render job queue shared by API nodes (submit/get/cancel) and workers (claim/renew/finish).
+
+    A claimed job carries a lease; a worker that stops renewing it is presumed
+    dead and the job is handed to another worker until it has been attempted
+    FARM_MAX_ATTEMPTS times.
+    """
+
+    @abstractmethod
+    def submit(self, payload: dict) -> str:
+        ...
+
+    @abstractmethod
+    def get(self, job_id: str) -> dict | None:
+        ...
+
+    @abstractmethod
+    def cancel(self, job_id: str):
+        ...
+
+    @abstractmethod
+    def claim(self, worker_id: str, lease_seconds: float) -> dict | None:
+        ...
+
+    @abstractmethod
+    def renew(self, job_id: str, worker_id: str, lease_seconds: float) -> bool:
+        """Extend the lease; False if the job was cancelled or reassigned"""
+
+    @abstractmethod
+    def complete(self, job_id: str, worker_id: str, result: dict) -> bool:
+        """Record the result; False if the job was cancelled or reassigned meanwhile"""
+
+    @abstractmethod
+    def fail(self, job_id: str, worker_id: str, error: str, retry: bool = False):
+        ...
+
+    @abstractmethod
+    def heartbeat(self, worker_id: str, busy_seconds: float = 0, completed: int = 0, failed: int = 0):
+        """Record that a worker is alive and add to its counters"""
+
+    @abstractmethod
+    def worker_stats(self) -> list:
+        ...
+
+
+class SqliteBroker(Broker):
+    """Broker on a SQLite file. Safe across processes on one host (WAL mode);
+    use a networked Broker implementation when workers span machines without
+    a filesystem that supports SQLite locking."""
+
+    def __init__(self, path: str, max_attempts: int = FARM_MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db().executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker TEXT,
+                lease_expires REAL,
+                result TEXT,
+                error TEXT,
+                created REAL NOT NULL,
+                started REAL,
+                finished REAL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created);
+            CREATE TABLE IF NOT EXISTS workers (
+                id TEXT PRIMARY KEY,
+                host TEXT,
+                started REAL NOT NULL,
+                last_seen REAL NOT NULL,
+                completed INTEGER NOT NULL DEFAULT 0,
+                failed INTEGER NOT NULL DEFAULT 0,
+                busy_seconds REAL NOT NULL DEFAULT 0
+            );
+        """)
+
+    def _db(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            self._local.db = db
+        return db
+
+    @contextmanager
+    def _tx(self):
+        """Write transaction; IMMEDIATE takes the lock up front so claims never race"""
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    @staticmethod
+    def _job(row) -> dict | None:
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def submit(self, payload: dict) -> str:
+        job_id = uuid.uuid4().hex
+        with self._tx() as db:
+            db.execute("INSERT INTO jobs (id, payload, status, created) VALUES (?, ?, ?, ?)",
+                       (job_id, json.dumps(payload), QUEUED, time.time()))
+        return job_id
+
+    def get(self, job_id: str) -> dict | None:
+        job = self._job(self._db().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+        now = time.time()
+        # Claims also expire leases, but with every worker dead nothing would claim;
+        # only take the write lock when this job's lease has actually run out
+        if job and job["status"] == RUNNING and job["lease_expires"] < now:
+            with self._tx() as db:
+                self._expire_leases(db, now)
+                job = self._job(db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+        return job
+
+    def cancel(self, job_id: str):
+        with self._tx() as db:
+            db.execute("UPDATE jobs SET status = ?, finished = ? WHERE id = ? AND status IN (?, ?)",
+                       (CANCELLED, time.time(), job_id, QUEUED, RUNNING))
+
+    def _expire_leases(self, db, now: float):
+        """Requeue jobs whose worker stopped renewing, or fail them when out of attempts"""
+        db.execute("UPDATE jobs SET status = ?, finished = ?, error = ? "
+                   "WHERE status = ? AND lease_expires < ? AND attempts >= ?",
+                   (FAILED, now, "Worker lost too many times", RUNNING, now, self.max_attempts))
+        db.execute("UPDATE jobs SET status = ?, worker = NULL, lease_expires = NULL "
+                   "WHERE status = ? AND lease_expires < ?",
+                   (QUEUED, RUNNING, now))
+
+    def claim(self, worker_id: str, lease_seconds: float) -> dict | None:
+        now = time.time()
+        with self._tx() as db:
+            self._expire_leases(db, now)
+            row = db.execute("SELECT id FROM jobs WHERE status = ? ORDER BY created LIMIT 1",
+                             (QUEUED,)).fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE jobs SET status = ?, worker = ?, attempts = attempts + 1, "
+                       "lease_expires = ?, started = ? WHERE id = ?",
+                       (RUNNING, worker_id, now + lease_seconds, now, row["id"]))
+            return self._job(db.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone())
+
+    def renew(self, job_id: str, worker_id: str, lease_seconds: float) -> bool:
+        with self._tx() as db:
+            cur = db.execute("UPDATE jobs SET lease_expires = ? WHERE id = ? AND worker = ? AND status = ?",
+                             (time.time() + lease_seconds, job_id, worker_id, RUNNING))
+            return cur.rowcount == 1
+
+    def complete(self, job_id: str, worker_id: str, result: dict) -> bool:
+        with self._tx() as db:
+            cur = db.execute("UPDATE jobs SET status = ?, result = ?, finished = ? WHERE id = ? AND worker = ? AND status = ?",
+                             (DONE, json.dumps(result), time.time(), job_id, worker_id, RUNNING))
+            return cur.rowcount == 1
+
+    def fail(self, job_id: str, worker_id: str, error: str, retry: bool = False):
+        with self._tx() as db:
+            if retry:
+                db.execute("UPDATE jobs SET status = ?, worker = NULL, lease_expires = NULL, error = ? "
+                           "WHERE id = ? AND worker = ? AND status = ? AND attempts < ?",
+                           (QUEUED, error, job_id, worker_id, RUNNING, self.max_attempts))
+            db.execute("UPDATE jobs SET status = ?, error = ?, finished = ? WHERE id = ? AND worker = ? AND status = ?",
+                       (FAILED, error, time.time(), job_id, worker_id, RUNNING))
+
+    def heartbeat(self, worker_id: str, busy_seconds: float = 0, completed: int = 0, failed: int = 0):
+        now = time.time()
+        with self._tx() as db:
+            db.execute("INSERT INTO workers (id, host, started, last_seen) VALUES (?, ?, ?, ?) "
+                       "ON CONFLICT(id) DO NOTHING", (worker_id, socket.gethostname(), now, now))
+            db.execute("UPDATE workers SET last_seen = ?, busy_seconds = busy_seconds + ?, "
+                       "completed = completed + ?, failed = failed + ? WHERE id = ?",
+                       (now, busy_seconds, completed, failed, worker_id))
+
+    def worker_stats(self) -> list:
+        now = time.time()
+        stats = []
+        for row in self._db().execute("SELECT * FROM workers ORDER BY started"):
+            uptime = max(now - row["started"], 1e-9)
+            stats.append({
+                **dict(row),
+                "alive": now - row["last_seen"] < FARM_WORKER_STALE,
+                "jobs_per_hour": round(row["completed"] / uptime * 3600, 2),
+                "utilization": round(min(row["busy_seconds"] / uptime, 1.0), 3),
+            })
+        return stats
+
+
+def get_broker(url: str = FARM_BROKER_URL) -> Broker:
+    """Build the broker named by a URL such as sqlite:////shared/farm.db"""
+    scheme, _, rest = url.partition("://")
+    if scheme == "sqlite":
+        return SqliteBroker(rest)
+    raise ValueError(f"Unsupported broker URL: {url}")
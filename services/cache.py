@@ -0,0 +1,124 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+
+from config import DOWNLOAD_DIR, RENDER_ORPHAN_GRACE, CACHE_TTL, CACHE_MAX_ENTRIES
+
+# fingerprint -> (expiry, finished render result {"file": ..., "title": ...})
+_results = OrderedDict()
+# client idempotency key -> (expiry, fingerprint it was first used with)
+_idempotency_keys = OrderedDict()
+# fingerprint -> running render task, shared by duplicate submissions
+_inflight = {}
+# fingerprint -> number of callers currently waiting on the in-flight task
+_waiters = {}
+# fingerprint -> pending cancellation of a render whose callers all went away
+_orphan_timers = {}
+
+
+def render_fingerprint(params: dict) -> str:
+    """Stable hash over every input that affects the rendered output"""
+    payload = json.dumps(params, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _remember(entries: OrderedDict, key: str, value):
+    """Store with a CACHE_TTL expiry, evicting the least recently used past CACHE_MAX_ENTRIES"""
+    entries[key] = (time.monotonic() + CACHE_TTL, value)
+    entries.move_to_end(key)
+    while len(entries) > CACHE_MAX_ENTRIES:
+        entries.popitem(last=False)
+
+
+def _recall(entries: OrderedDict, key: str):
+    """Return an unexpired value and mark it recently used, or None"""
+    entry = entries.get(key)
+    if entry is None:
+        return None
+    if entry[0] < time.monotonic():
+        del entries[key]
+        return None
+    entries.move_to_end(key)
+    return entry[1]
+
+
+def get_cached_result(fingerprint: str) -> dict | None:
+    """Return a finished render for this fingerprint if its output still exists"""
+    result = _recall(_results, fingerprint)
+    if result is None:
+        return None
+    if not os.path.exists(os.path.join(DOWNLOAD_DIR, result["file"])):
+        _results.pop(fingerprint, None)
+        return None
+    return result
+
+
+def bind_idempotency_key(key: str, fingerprint: str):
+    """Tie a client idempotency key to one set of render parameters"""
+    bound = _recall(_idempotency_keys, key)
+    if bound is None:
+        _remember(_idempotency_keys, key, fingerprint)
+    elif bound != fingerprint:
+        raise ValueError("Idempotency key was already used with different parameters")
+
+
+def _cancel_orphan(fingerprint: str, task: asyncio.Task):
+    """Cancel a shared render nobody rejoined during the grace period"""
+    _orphan_timers.pop(fingerprint, None)
+    if not _waiters.get(fingerprint) and not task.done():
+        print(f"[CACHE] No callers left, cancelling render {fingerprint[:12]}")
+        task.cancel()
+
+
+def _finish(fingerprint: str, task: asyncio.Task):
+    _inflight.pop(fingerprint, None)
+    timer = _orphan_timers.pop(fingerprint, None)
+    if timer:
+        timer.cancel()
+    if task.cancelled() or task.exception() is not None:
+        return
+    _remember(_results, fingerprint, task.result())
+
+
+async def run_once(fingerprint: str, render):
+    """Return the cached result, join an in-flight render, or start a new one.
+
+    `render` is a zero-argument coroutine function; it is only called when no
+    finished or running render exists for the fingerprint. Once every caller
+    waiting on the shared render has been cancelled it keeps running for
+    RENDER_ORPHAN_GRACE seconds, so a client retrying after a timeout rejoins it,
+    and is cancelled only if nobody does.
+    """
+    cached = get_cached_result(fingerprint)
+    if cached is not None:
+        return cached
+
+    task = _inflight.get(fingerprint)
+    if task is None:
+        print(f"[CACHE] Starting render {fingerprint[:12]}")
+        task = asyncio.ensure_future(render())
+        _inflight[fingerprint] = task
+        task.add_done_callback(lambda t: _finish(fingerprint, t))
+    else:
+        print(f"[CACHE] Joining in-flight render {fingerprint[:12]}")
+
+    # Shield so one caller going away does not cancel the shared render
+    timer = _orphan_timers.pop(fingerprint, None)
+    if timer:
+        timer.cancel()
+    _waiters[fingerprint] = _waiters.get(fingerprint, 0) + 1
+    try:
+        return await asyncio.shield(task)
+    except asyncio.CancelledError:
+        if _waiters.get(fingerprint) == 1 and not task.done():
+            _orphan_timers[fingerprint] = asyncio.get_running_loop().call_later(
+                RENDER_ORPHAN_GRACE, _cancel_orphan, fingerprint, task
+            )
+        raise
+    finally:
+        _waiters[fingerprint] -= 1
+        if not _waiters[fingerprint]:
+            del _waiters[fingerprint]
@@ -1,5 +1,4 @@
 # services/groq.py
-import httpx
 import json
 import re
 from config import GROQ_API_KEY
@@ -16,6 +15,9 @@ async def format_text_with_groq(text: str) -> dict:
     
     print(f"[GROQ] Processing: {text[:50]}...")
     
+    # Imported here so the app can start serving before httpx is loaded
+    import httpx
+
     try:
         async with httpx.AsyncClient() as client:
             response = await client.post(
@@ -0,0 +1,170 @@
+import contextvars
+import os
+import signal
+import subprocess
+import threading
+import time
+
+from config import PROBE_TIMEOUT, RENDER_TIMEOUT_BASE, RENDER_TIMEOUT_PER_SECOND, RENDER_NICE
+from services.profiling import current_profile
+
+IS_WINDOWS = os.name == "nt"
+
+# Cancellation event of the job running in the current context. asyncio.to_thread
+# copies the context, so worker threads see the job of the request that started them.
+current_job = contextvars.ContextVar("current_job", default=None)
+
+METRICS = {
+    "started": 0,
+    "completed": 0,
+    "failed": 0,
+    "timed_out": 0,
+    "killed": 0,
+}
+_metrics_lock = threading.Lock()
+
+
+class ProcessTimeout(Exception):
+    pass
+
+
+class ProcessCancelled(Exception):
+    pass
+
+
+def _count(name: str):
+    with _metrics_lock:
+        METRICS[name] += 1
+
+
+def render_deadline(duration: float) -> float:
+    """Seconds an encode of `duration` seconds of video may take before it is killed"""
+    return RENDER_TIMEOUT_BASE + RENDER_TIMEOUT_PER_SECOND * max(duration or 0, 0)
+
+
+def raise_if_cancelled():
+    """Abort in-process work (e.g. yt-dlp) once the current job is cancelled"""
+    job = current_job.get()
+    if job is not None and job.is_set():
+        raise ProcessCancelled("Render cancelled")
+
+
+def _kill_tree(proc: subprocess.Popen):
+    """Kill the process and everything it spawned"""
+    try:
+        if IS_WINDOWS:
+            subprocess.run(['taskkill', '/F', '/T', '/PID', str(proc.pid)], capture_output=True)
+        else:
+            os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError, OSError):
+        proc.kill()
+
+
+def _pump(chunks, pipe, errors: list):
+    """Feed an iterable of bytes into the child's stdin until it is exhausted or the child exits.
+
+    A failure to produce the input (source read error, truncated download,
+    cancellation) is appended to `errors` so run() can fail the command.
+    """
+    raw = getattr(pipe, "buffer", pipe)
+    try:
+        for chunk in chunks:
+            try:
+                raw.write(chunk)
+            except (BrokenPipeError, OSError, ValueError):
+                # Child closed its input early (e.g. -t reached) or was killed
+                break
+    except Exception as e:
+        errors.append(e)
+    finally:
+        try:
+            pipe.close()
+        except OSError:
+            pass
+        close = getattr(chunks, "close", None)
+        if close:
+            close()
+
+
+def run(cmd: list, timeout: float = PROBE_TIMEOUT, text: bool = False, background: bool = False,
+        stdin_chunks=None):
+    """subprocess.run replacement with a deadline, cancellation and tree kill.
+
+    Output is always captured. `background` lowers the child's priority by
+    RENDER_NICE so long encodes yield to request handling. `stdin_chunks` is an
+    optional iterable of bytes streamed to the child's stdin from a helper thread.
+    """
+    kwargs = {}
+    if IS_WINDOWS:
+        flags = subprocess.CREATE_NEW_PROCESS_GROUP
+        if background and RENDER_NICE > 0:
+            flags |= subprocess.BELOW_NORMAL_PRIORITY_CLASS
+        kwargs["creationflags"] = flags
+    else:
+        kwargs["start_new_session"] = True
+
+    job = current_job.get()
+    raise_if_cancelled()
+
+    profile = current_profile.get()
+    if profile is not None and os.path.basename(cmd[0]).startswith('ffmpeg'):
+        cmd = [cmd[0], '-benchmark', *cmd[1:]]
+    started = time.perf_counter()
+
+    stdin = subprocess.PIPE if stdin_chunks is not None else None
+    proc = subprocess.Popen(cmd, stdin=stdin, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=text, **kwargs)
+    _count("started")
+    if background and RENDER_NICE > 0 and not IS_WINDOWS:
+        # Set from here rather than preexec_fn, which can deadlock the child of a threaded
+        # parent; the child has barely started, so anything it spawns inherits the value
+        try:
+            os.setpriority(os.PRIO_PROCESS, proc.pid, RENDER_NICE)
+        except OSError:
+            pass
+
+    if stdin_chunks is not None:
+        # Hand stdin to the pump thread; communicate() below only drains output
+        pipe, proc.stdin = proc.stdin, None
+        context = contextvars.copy_context()
+        pump_errors = []
+        pump = threading.Thread(target=context.run, args=(_pump, stdin_chunks, pipe, pump_errors), daemon=True)
+        pump.start()
+
+    # Poll in short slices so a cancelled job is noticed quickly
+    remaining = timeout
+    while True:
+        try:
+            stdout, stderr = proc.communicate(timeout=min(0.5, remaining))
+            break
+        except subprocess.TimeoutExpired:
+            remaining -= 0.5
+            if job is not None and job.is_set():
+                _kill_tree(proc)
+                proc.communicate()
+                _count("killed")
+                raise ProcessCancelled(f"{os.path.basename(cmd[0])} cancelled")
+            if remaining <= 0:
+                _kill_tree(proc)
+                proc.communicate()
+                _count("timed_out")
+                raise ProcessTimeout(f"{os.path.basename(cmd[0])} timed out after {timeout:.0f}s")
+
+    if stdin_chunks is not None:
+        # The pipe is closed once the pump finishes, so this only waits out the last chunk
+        pump.join(timeout=5)
+        if pump_errors:
+            # ffmpeg exits cleanly on a short input; the output is still truncated
+            _count("failed")
+            if isinstance(pump_errors[0], ProcessCancelled):
+                raise pump_errors[0]
+            raise Exception(f"Input stream for {os.path.basename(cmd[0])} failed: {pump_errors[0]}")
+
+    _count("completed" if proc.returncode == 0 else "failed")
+    if profile is not None:
+        profile.record_subprocess(cmd, time.perf_counter() - started, stderr)
+    return subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr)
+
+
+def get_metrics() -> dict:
+    with _metrics_lock:
+        return dict(METRICS)
@@ -0,0 +1,131 @@
+import contextvars
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from config import DOWNLOAD_DIR, PROFILE_INTERVAL
+
+# Profile of the render running in the current context; copied into worker threads
+current_profile = contextvars.ContextVar("current_profile", default=None)
+
+# Artifact suffixes written by Profile.save(), keyed by the admin endpoint's format name
+PROFILE_FILES = {
+    "folded": "_profile.folded",
+    "pstats": "_profile.pstats",
+    "benchmark": "_benchmark.json",
+}
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class Profile:
+    """Wall-clock sampler plus cProfile for one render job.
+
+    The sampler records the stacks of every thread registered with the job
+    (the event loop thread and the worker threads it hands work to), so time
+    spent waiting on ffmpeg or the network shows up next to Python CPU time.
+    Stacks are written in the collapsed format read by flamegraph.pl and
+    speedscope. Samples of the loop thread include other requests it serves.
+    """
+
+    def __init__(self, job_id: str, interval: float = PROFILE_INTERVAL):
+        self.job_id = job_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.subprocesses = []
+        self.cprofile = cProfile.Profile()
+        self._threads = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+        self._started = None
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._threads.add(threading.get_ident())
+        self._sampler.start()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                for tid in self._threads:
+                    frame = frames.get(tid)
+                    stack = []
+                    while frame is not None:
+                        stack.append(_frame_label(frame))
+                        frame = frame.f_back
+                    if stack:
+                        self.stacks[";".join(reversed(stack))] += 1
+
+    def run(self, fn, *args):
+        """Call fn in the current (worker) thread with sampling and cProfile on"""
+        tid = threading.get_ident()
+        with self._lock:
+            self._threads.add(tid)
+        try:
+            self.cprofile.enable()
+            enabled = True
+        except ValueError:
+            # Another job's cProfile is active; the sampler still covers this thread
+            enabled = False
+        try:
+            return fn(*args)
+        finally:
+            if enabled:
+                self.cprofile.disable()
+            with self._lock:
+                self._threads.discard(tid)
+
+    def record_subprocess(self, cmd: list, seconds: float, stderr):
+        """Keep wall time and ffmpeg -benchmark lines of a child process"""
+        if isinstance(stderr, bytes):
+            stderr = stderr.decode("utf-8", "replace")
+        bench = [line.strip() for line in (stderr or "").splitlines() if line.startswith("bench:")]
+        self.subprocesses.append({
+            "command": os.path.basename(cmd[0]),
+            "wall_seconds": round(seconds, 3),
+            "benchmark": bench,
+        })
+
+    def save(self) -> dict:
+        """Stop sampling and write the artifacts next to the job's other files"""
+        self._stop.set()
+        self._sampler.join()
+        paths = {fmt: os.path.join(DOWNLOAD_DIR, f"{self.job_id}{suffix}") for fmt, suffix in PROFILE_FILES.items()}
+
+        with open(paths["folded"], "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        self.cprofile.dump_stats(paths["pstats"])
+        with open(paths["benchmark"], "w", encoding="utf-8") as f:
+            json.dump({
+                "job_id": self.job_id,
+                "wall_seconds": round(time.perf_counter() - self._started, 3),
+                "sample_interval": self.interval,
+                "subprocesses": self.subprocesses,
+            }, f, indent=2)
+        print(f"[PROFILE] Saved profile for {self.job_id} ({sum(self.stacks.values())} samples)")
+        return paths
+
+
+def call(fn, *args):
+    """Run fn under the current job's profile if there is one (use inside to_thread)"""
+    profile = current_profile.get()
+    if profile is None:
+        return fn(*args)
+    return profile.run(fn, *args)
+
+
+def profile_path(job_id: str, fmt: str) -> str | None:
+    suffix = PROFILE_FILES.get(fmt)
+    if suffix is None:
+        return None
+    return os.path.join(DOWNLOAD_DIR, f"{job_id}{suffix}")
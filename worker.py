@@ -0,0 +1,167 @@
+# worker.py
+"""Render worker for RENDER_MODE=farm.
+
+Start any number of these on any node that shares the broker and artifact
+store with the API nodes. Each process renders one job at a time, so run one
+per core you want to dedicate:
+
+    RENDER_MODE=farm python worker.py
+"""
+import argparse
+import asyncio
+import os
+import socket
+import threading
+import time
+
+from fastapi import HTTPException
+
+from config import DOWNLOAD_DIR, FARM_LEASE_SECONDS, FARM_POLL_INTERVAL
+from services.broker import get_broker
+from services.artifacts import get_artifact_store
+from services.profiling import PROFILE_FILES
+from app import render_video
+
+# Idle workers refresh their liveness this often instead of on every poll
+IDLE_HEARTBEAT = 10
+
+
+def fetch_inputs(store, payload: dict):
+    """Copy the prepared source and background image this job needs into DOWNLOAD_DIR"""
+    if payload.get("video_id"):
+        names = store.list(f"{payload['video_id']}_raw")
+        if not names:
+            raise HTTPException(status_code=400, detail="Prepared video not found")
+        for name in names:
+            store.get(name, os.path.join(DOWNLOAD_DIR, name))
+    if payload.get("bg_type") == "image" and payload.get("bg_image_id"):
+        store.get(payload["bg_image_id"], os.path.join(DOWNLOAD_DIR, payload["bg_image_id"]))
+
+
+def publish_outputs(store, result: dict) -> list:
+    """Move the rendered reel (and any profile) to the store and drop local copies"""
+    names = [result["file"]]
+    if result.get("profile"):
+        names += [f"{result['profile']}{suffix}" for suffix in PROFILE_FILES.values()]
+    published = []
+    for name in names:
+        path = os.path.join(DOWNLOAD_DIR, name)
+        if os.path.exists(path):
+            store.put(path)
+            os.remove(path)
+            published.append(name)
+    return published
+
+
+def consume_inputs(store, payload: dict):
+    """Drop the prepared source from the store once the render is recorded, as in local mode"""
+    if payload.get("video_id"):
+        for name in store.list(f"{payload['video_id']}_raw") + store.list(f"{payload['video_id']}_preview"):
+            store.delete(name)
+
+
+def run_job(broker, store, worker_id: str, job: dict, lease: float) -> bool | None:
+    """Render one claimed job while renewing its lease; True on success, None if cancelled or reassigned"""
+    payload = job["payload"]
+    loop = asyncio.new_event_loop()
+    stop = threading.Event()
+
+    async def work():
+        await asyncio.to_thread(fetch_inputs, store, payload)
+        return await render_video(**payload)
+
+    task = loop.create_task(work())
+
+    def keep_lease():
+        # Losing the lease means the job was cancelled or handed to another worker
+        while not stop.wait(lease / 3):
+            if not broker.renew(job["id"], worker_id, lease):
+                print(f"[WORKER] Lost lease on {job['id']}, aborting")
+                loop.call_soon_threadsafe(task.cancel)
+                return
+
+    threading.Thread(target=keep_lease, daemon=True).start()
+    try:
+        result = loop.run_until_complete(task)
+        published = publish_outputs(store, result)
+        if not broker.complete(job["id"], worker_id, result):
+            # Cancelled or handed to another worker meanwhile: that worker needs the inputs
+            print(f"[WORKER] {job['id']} no longer ours, discarding result")
+            for name in published:
+                store.delete(name)
+            return None
+        consume_inputs(store, payload)
+        return True
+    except asyncio.CancelledError:
+        return None
+    except HTTPException as e:
+        # Bad input or a failed encode: another attempt would fail the same way
+        broker.fail(job["id"], worker_id, str(e.detail))
+        return False
+    except Exception as e:
+        # Store or broker trouble on this node: let another worker try
+        print(f"[WORKER] Job {job['id']} failed: {e}")
+        broker.fail(job["id"], worker_id, str(e), retry=True)
+        return False
+    finally:
+        stop.set()
+        # Wait for worker threads; a cancelled render kills its ffmpeg promptly
+        loop.run_until_complete(loop.shutdown_default_executor())
+        loop.close()
+        # Nothing from this job stays on the worker, whatever the outcome
+        if payload.get("video_id"):
+            for name in os.listdir(DOWNLOAD_DIR):
+                if name.startswith(f"{payload['video_id']}_raw"):
+                    os.remove(os.path.join(DOWNLOAD_DIR, name))
+        if payload.get("bg_image_id"):
+            path = os.path.join(DOWNLOAD_DIR, payload["bg_image_id"])
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--worker-id", default=f"{socket.gethostname()}-{os.getpid()}")
+    parser.add_argument("--lease", type=float, default=FARM_LEASE_SECONDS, help="Lease length in seconds")
+    parser.add_argument("--report-every", type=float, default=60, help="Seconds between throughput logs")
+    args = parser.parse_args()
+
+    broker = get_broker()
+    store = get_artifact_store()
+    broker.heartbeat(args.worker_id)
+    print(f"[WORKER] {args.worker_id} waiting for jobs")
+
+    started = last_beat = last_report = time.time()
+    completed = failed = 0
+    busy = 0.0
+    while True:
+        job = broker.claim(args.worker_id, args.lease)
+        now = time.time()
+        if job is None:
+            if now - last_beat >= IDLE_HEARTBEAT:
+                broker.heartbeat(args.worker_id)
+                last_beat = now
+            time.sleep(FARM_POLL_INTERVAL)
+        else:
+            print(f"[WORKER] Claimed {job['id']} (attempt {job['attempts']})")
+            job_started = time.perf_counter()
+            ok = run_job(broker, store, args.worker_id, job, args.lease)
+            elapsed = time.perf_counter() - job_started
+            # A cancelled or reassigned job (client gone or lease lost) is neither done nor failed
+            completed += ok is True
+            failed += ok is False
+            busy += elapsed
+            broker.heartbeat(args.worker_id, busy_seconds=elapsed, completed=int(ok is True), failed=int(ok is False))
+            last_beat = time.time()
+            outcome = "cancelled" if ok is None else "done" if ok else "failed"
+            print(f"[WORKER] {job['id']} {outcome} in {elapsed:.1f}s")
+
+        if now - last_report >= args.report_every:
+            uptime = now - started
+            print(f"[WORKER] {completed} done, {failed} failed, "
+                  f"{completed / uptime * 3600:.1f} jobs/h, {busy / uptime:.0%} busy")
+            last_report = now
+
+
+if __name__ == "__main__":
+    main()